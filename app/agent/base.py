@@ -1,8 +1,9 @@
+import io
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
 from typing import List, Optional
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 from app.llm import LLM
 from app.logger import logger
@@ -10,6 +11,13 @@ from app.sandbox.client import SANDBOX_CLIENT
 from app.schema import ROLE_TYPE, AgentState, Memory, Message
 
 
+# Number of agent runs currently in flight. The sandbox client is
+# process-global, so cleanup may only happen when the last run finishes —
+# otherwise one lane of a parallel batch tears it down under the others.
+# The event loop is single-threaded, so a plain int is safe here.
+_active_runs = 0
+
+
 class BaseAgent(BaseModel, ABC):
     """Abstract base class for managing agent state and execution.
 
@@ -42,9 +50,22 @@ class BaseAgent(BaseModel, ABC):
 
     duplicate_threshold: int = 2
 
-    class Config:
-        arbitrary_types_allowed = True
-        extra = "allow"  # Allow extra fields for flexibility in subclasses
+    # Message factories per role, hoisted so update_memory doesn't rebuild
+    # the mapping (and a lambda closure) on every call
+    _MESSAGE_FACTORIES = {
+        "user": Message.user_message,
+        "system": Message.system_message,
+        "assistant": Message.assistant_message,
+        "tool": Message.tool_message,
+    }
+
+    # validate_assignment stays off so the hot loop's writes to current_step
+    # and state are plain attribute sets with no per-assign validation pass
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+        extra="allow",  # Allow extra fields for flexibility in subclasses
+        validate_assignment=False,
+    )
 
     @model_validator(mode="after")
     def initialize_agent(self) -> "BaseAgent":
@@ -68,9 +89,17 @@ class BaseAgent(BaseModel, ABC):
         Raises:
             ValueError: If the new_state is invalid.
         """
-        if not isinstance(new_state, AgentState):
+        # AgentState is never subclassed, so an exact type check (a single
+        # pointer compare) replaces the MRO walk isinstance would do
+        if type(new_state) is not AgentState:
             raise ValueError(f"Invalid state: {new_state}")
 
+        # Fast path: re-entering the current state (e.g. nested runs) needs no
+        # save/restore; the exception path would restore the same state anyway
+        if new_state == self.state:
+            yield
+            return
+
         previous_state = self.state
         self.state = new_state
         try:
@@ -99,19 +128,18 @@ class BaseAgent(BaseModel, ABC):
         Raises:
             ValueError: If the role is unsupported.
         """
-        message_map = {
-            "user": Message.user_message,
-            "system": Message.system_message,
-            "assistant": Message.assistant_message,
-            "tool": lambda content, **kw: Message.tool_message(content, **kw),
-        }
-
-        if role not in message_map:
+        factory = self._MESSAGE_FACTORIES.get(role)
+        if factory is None:
             raise ValueError(f"Unsupported message role: {role}")
 
         # Create message with appropriate parameters based on role
-        kwargs = {"base64_image": base64_image, **(kwargs if role == "tool" else {})}
-        self.memory.add_message(message_map[role](content, **kwargs))
+        if role == "tool":
+            message = factory(content, base64_image=base64_image, **kwargs)
+        elif role == "system":
+            message = factory(content)
+        else:
+            message = factory(content, base64_image=base64_image)
+        self.memory.add_message(message)
 
     async def run(self, request: Optional[str] = None) -> str:
         """Execute the agent's main loop asynchronously.
@@ -125,33 +153,58 @@ class BaseAgent(BaseModel, ABC):
         Raises:
             RuntimeError: If the agent is not in IDLE state at start.
         """
+        # Rejected invocations must not reach the cleanup below: the sandbox
+        # client is process-global, and tearing it down here would yank it
+        # out from under a run that is legitimately in flight
         if self.state != AgentState.IDLE:
             raise RuntimeError(f"Cannot run agent from state: {self.state}")
 
-        if request:
-            self.update_memory("user", request)
-
-        results: List[str] = []
-        async with self.state_context(AgentState.RUNNING):
-            while (
-                self.current_step < self.max_steps and self.state != AgentState.FINISHED
-            ):
-                self.current_step += 1
-                logger.info(f"Executing step {self.current_step}/{self.max_steps}")
-                step_result = await self.step()
-
-                # Check for stuck state
-                if self.is_stuck():
-                    self.handle_stuck_state()
-
-                results.append(f"Step {self.current_step}: {step_result}")
-
-            if self.current_step >= self.max_steps:
-                self.current_step = 0
-                self.state = AgentState.IDLE
-                results.append(f"Terminated: Reached max steps ({self.max_steps})")
-        await SANDBOX_CLIENT.cleanup()
-        return "\n".join(results) if results else "No steps executed"
+        # Cleanup lives in a finally so every exit path of a started run —
+        # normal completion, step errors, caller cancellation — releases
+        # the sandbox; the refcount defers it until the last concurrent
+        # run (e.g. sibling lanes of a parallel batch) has finished
+        global _active_runs
+        _active_runs += 1
+        try:
+            if request:
+                self.update_memory("user", request)
+
+            # Stream step results into a single buffer instead of collecting a
+            # list of per-step f-strings and joining at the end
+            buf = io.StringIO()
+            async with self.state_context(AgentState.RUNNING):
+                while (
+                    self.current_step < self.max_steps
+                    and self.state != AgentState.FINISHED
+                ):
+                    self.current_step += 1
+                    logger.info(
+                        "Executing step {}/{}", self.current_step, self.max_steps
+                    )
+                    step_result = await self.step()
+
+                    # Check for stuck state
+                    if self.is_stuck():
+                        self.handle_stuck_state()
+
+                    if buf.tell():
+                        buf.write("\n")
+                    buf.write("Step ")
+                    buf.write(str(self.current_step))
+                    buf.write(": ")
+                    buf.write(step_result)
+
+                if self.current_step >= self.max_steps:
+                    self.current_step = 0
+                    self.state = AgentState.IDLE
+                    if buf.tell():
+                        buf.write("\n")
+                    buf.write(f"Terminated: Reached max steps ({self.max_steps})")
+            return buf.getvalue() or "No steps executed"
+        finally:
+            _active_runs -= 1
+            if _active_runs == 0:
+                await SANDBOX_CLIENT.cleanup()
 
     @abstractmethod
     async def step(self) -> str:
@@ -165,7 +218,7 @@ class BaseAgent(BaseModel, ABC):
         stuck_prompt = "\
         Observed duplicate responses. Consider new strategies and avoid repeating ineffective paths already attempted."
         self.next_step_prompt = f"{stuck_prompt}\n{self.next_step_prompt}"
-        logger.warning(f"Agent detected stuck state. Added prompt: {stuck_prompt}")
+        logger.warning("Agent detected stuck state. Added prompt: {}", stuck_prompt)
 
     def is_stuck(self) -> bool:
         """Check if the agent is stuck in a loop by detecting duplicate content"""
@@ -176,12 +229,10 @@ class BaseAgent(BaseModel, ABC):
         if not last_message.content:
             return False
 
-        # Count identical content occurrences
-        duplicate_count = sum(
-            1
-            for msg in reversed(self.memory.messages[:-1])
-            if msg.role == "assistant" and msg.content == last_message.content
-        )
+        # Memory tracks duplicate contents incrementally, so this is O(1)
+        duplicate_count = self.memory.duplicate_count(last_message.content)
+        if last_message.role == "assistant":
+            duplicate_count -= 1  # Exclude the last message itself
 
         return duplicate_count >= self.duplicate_threshold
 
@@ -193,4 +244,4 @@ class BaseAgent(BaseModel, ABC):
     @messages.setter
     def messages(self, value: List[Message]):
         """Set the list of messages in the agent's memory."""
-        self.memory.messages = value
+        self.memory.set_messages(value)
@@ -0,0 +1,6 @@
+from app.cache.semantic import SemanticCache
+
+
+__all__ = [
+    "SemanticCache",
+]
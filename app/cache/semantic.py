@@ -0,0 +1,96 @@
+"""In-process semantic cache keyed by embedding similarity.
+
+Near-duplicate prompts (e.g. "create a plan for X", "summarize plan Y")
+recur across runs; caching their results by embedding similarity skips the
+LLM round-trip entirely on a hit.
+"""
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+import numpy as np
+
+from app.logger import logger
+
+
+# An async callable that maps text to an embedding vector
+Embedder = Callable[[str], Awaitable[Sequence[float]]]
+
+
+class SemanticCache:
+    """LRU-bounded vector store mapping embedded texts to cached values.
+
+    Lookups embed the query text and return the stored value with the
+    highest cosine similarity, provided it exceeds the configured
+    threshold. Entries beyond ``max_entries`` evict least-recently-used.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        similarity_threshold: float = 0.92,
+        max_entries: int = 1024,
+    ):
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        # text -> (unit-normalized embedding, cached value)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed text into a unit-normalized vector, or None on failure."""
+        try:
+            vector = np.asarray(await self.embedder(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    async def get(self, text: str) -> Optional[Any]:
+        """Return the cached value most similar to text, or None on a miss."""
+        if not self._entries:
+            return None
+
+        # Exact hit needs no embedding round-trip
+        entry = self._entries.get(text)
+        if entry is not None:
+            self._entries.move_to_end(text)
+            return entry[1]
+
+        query = await self._embed(text)
+        if query is None:
+            return None
+
+        keys = list(self._entries)
+        matrix = np.stack([self._entries[key][0] for key in keys])
+        similarities = matrix @ query
+
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+
+        best_key = keys[best]
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key][1]
+
+    async def put(self, text: str, value: Any) -> None:
+        """Store a value under the embedding of text, evicting LRU entries."""
+        vector = await self._embed(text)
+        if vector is None:
+            return
+
+        self._entries[text] = (vector, value)
+        self._entries.move_to_end(text)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        self._entries.clear()
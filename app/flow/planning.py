@@ -1,16 +1,27 @@
-import json
+import asyncio
+import re
 import time
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from itertools import chain
+from typing import Dict, List, Optional, Tuple, Union
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
+
+
+try:
+    # orjson parses typical LLM tool-call JSON 2-3x faster than stdlib json
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
 from app.agent.base import BaseAgent
+from app.cache import SemanticCache
 from app.flow.base import BaseFlow
 from app.llm import LLM
 from app.logger import logger
 from app.schema import AgentState, Message, ToolChoice
 from app.tool import PlanningTool
+from app.tool.planning import render_steps
 
 
 class PlanStepStatus(str, Enum):
@@ -22,28 +33,64 @@ class PlanStepStatus(str, Enum):
     BLOCKED = "blocked"
 
     @classmethod
-    def get_all_statuses(cls) -> list[str]:
-        """Return a list of all possible step status values"""
-        return [status.value for status in cls]
+    def get_all_statuses(cls) -> tuple:
+        """Return all possible step status values"""
+        return _ALL_STATUSES
 
     @classmethod
-    def get_active_statuses(cls) -> list[str]:
-        """Return a list of values representing active statuses (not started or in progress)"""
-        return [cls.NOT_STARTED.value, cls.IN_PROGRESS.value]
+    def get_active_statuses(cls) -> frozenset:
+        """Return the values representing active statuses (not started or in progress)"""
+        return _ACTIVE_STATUSES
 
     @classmethod
     def get_status_marks(cls) -> Dict[str, str]:
         """Return a mapping of statuses to their marker symbols"""
-        return {
-            cls.COMPLETED.value: "[✓]",
-            cls.IN_PROGRESS.value: "[→]",
-            cls.BLOCKED.value: "[!]",
-            cls.NOT_STARTED.value: "[ ]",
-        }
+        return _STATUS_MARKS
+
+
+# Frozen accessor outputs: the enum never changes at runtime, so these are
+# built once instead of rebuilding a list/dict on every call. The active-set
+# frozenset also turns per-step membership tests into O(1) hashed lookups.
+_ALL_STATUSES = tuple(status.value for status in PlanStepStatus)
+_ACTIVE_STATUSES = frozenset(
+    {PlanStepStatus.NOT_STARTED.value, PlanStepStatus.IN_PROGRESS.value}
+)
+_STATUS_MARKS = {
+    PlanStepStatus.COMPLETED.value: "[✓]",
+    PlanStepStatus.IN_PROGRESS.value: "[→]",
+    PlanStepStatus.BLOCKED.value: "[!]",
+    PlanStepStatus.NOT_STARTED.value: "[ ]",
+}
+
+
+# Precompiled pattern for step type/category tags like [SEARCH] or [CODE]
+_STEP_TYPE_RE = re.compile(r"\[([A-Z_]+)\]")
+
+
+def _extract_step_type(step: str) -> Optional[str]:
+    """Extract a step's type tag, skipping the [PAR] parallelism marker.
+
+    [PAR] only marks a step as safe to run concurrently; the first other
+    tag (e.g. "[PAR] [SEARCH] ...") is what routes the step to an executor.
+    """
+    for match in _STEP_TYPE_RE.finditer(step):
+        tag = match.group(1)
+        if tag != "PAR":
+            return tag.lower()
+    return None
 
 
 class PlanningFlow(BaseFlow):
-    """A flow that manages planning and execution of tasks using agents."""
+    """A flow that manages planning and execution of tasks using agents.
+
+    Steps marked with a `[PAR]` tag are treated as independent: consecutive
+    `[PAR]` steps are dispatched concurrently and joined before the flow
+    moves on, so a batch costs max(t_i) instead of sum(t_i) in LLM latency.
+    `[PAR]` is purely a parallelism marker and never selects an executor;
+    a typed step combines it with a type tag (e.g. "[PAR] [SEARCH] ...")
+    that routes to the matching agent key, so batch members with distinct
+    types land on distinct executors and actually overlap.
+    """
 
     llm: LLM = Field(default_factory=lambda: LLM())
     planning_tool: PlanningTool = Field(default_factory=PlanningTool)
@@ -51,6 +98,41 @@ class PlanningFlow(BaseFlow):
     active_plan_id: str = Field(default_factory=lambda: f"plan_{int(time.time())}")
     current_step_index: Optional[int] = None
 
+    # Optional semantic cache: when set, near-duplicate plan requests and
+    # finalize summaries are replayed from cache instead of calling the LLM
+    semantic_cache: Optional[SemanticCache] = Field(default=None)
+
+    # When enabled, _finalize_plan races the LLM summary against the agent
+    # fallback speculatively instead of waiting for the LLM call to fail.
+    # Off by default since the hedge can double LLM cost on slow backends.
+    hedged_finalize: bool = Field(default=False)
+
+    # Serializes concurrent step-status mutations during parallel batches
+    _status_lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+
+    # Cached plan text, invalidated whenever plan steps or statuses change
+    _plan_text_cache: Optional[str] = PrivateAttr(default=None)
+    _plan_version: int = PrivateAttr(default=0)
+
+    # Status transitions accumulated during a parallel batch and flushed in
+    # one mark_steps call when the batch joins (or when plan text is read)
+    _pending_status_updates: List[Tuple[int, str]] = PrivateAttr(default_factory=list)
+    _defer_status_updates: bool = PrivateAttr(default=False)
+
+    # Index where the next active step is expected; steps complete in order,
+    # so scanning from here makes _get_current_step_info amortized O(1)
+    _next_active_hint: int = PrivateAttr(default=0)
+
+    # Static instruction block sent before any dynamic content. Keeping this
+    # prefix identical across steps lets LLM providers reuse their prompt cache
+    # for it instead of re-processing the whole prompt on every step.
+    _STATIC_STEP_PREAMBLE = (
+        "You are an agent executing one step of a larger plan. "
+        "Carry out the task assigned to you using the appropriate tools. "
+        "Focus only on the current step; do not attempt other steps of the plan. "
+        "When you're done, provide a summary of what you accomplished."
+    )
+
     def __init__(
         self, agents: Union[BaseAgent, List[BaseAgent], Dict[str, BaseAgent]], **data
     ):
@@ -104,7 +186,8 @@ class PlanningFlow(BaseFlow):
                 # Verify plan was created successfully
                 if self.active_plan_id not in self.planning_tool.plans:
                     logger.error(
-                        f"Plan creation failed. Plan ID {self.active_plan_id} not found in planning tool."
+                        "Plan creation failed. Plan ID {} not found in planning tool.",
+                        self.active_plan_id,
                     )
                     return f"Failed to create plan for: {input_text}"
 
@@ -118,24 +201,51 @@ class PlanningFlow(BaseFlow):
                     result += await self._finalize_plan()
                     break
 
-                # Execute current step with appropriate agent
-                step_type = step_info.get("type") if step_info else None
-                executor = self.get_executor(step_type)
-                step_result = await self._execute_step(executor, step_info)
-                result += step_result + "\n"
+                # Collect consecutive [PAR]-tagged steps into a parallel batch
+                batch = await self._get_parallel_batch(
+                    self.current_step_index, step_info
+                )
 
-                # Check if agent wants to terminate
-                if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
+                if len(batch) > 1:
+                    # Parallel phase: dispatch the batch concurrently and join
+                    step_results, executors = await self._execute_parallel_batch(batch)
+                    result += "".join(step_results)
+                else:
+                    # Sequential phase: execute the single step as before
+                    step_type = step_info.get("type") if step_info else None
+                    executor = self.get_executor(step_type)
+                    step_result = await self._execute_step(executor, step_info)
+                    result += step_result + "\n"
+                    executors = [executor]
+
+                # Check if any executor wants to terminate
+                if any(
+                    hasattr(executor, "state")
+                    and executor.state == AgentState.FINISHED
+                    for executor in executors
+                ):
                     break
 
             return result
         except Exception as e:
-            logger.error(f"Error in PlanningFlow: {str(e)}")
+            logger.error("Error in PlanningFlow: {}", str(e))
             return f"Execution failed: {str(e)}"
 
     async def _create_initial_plan(self, request: str) -> None:
         """Create an initial plan based on the request using the flow's LLM and PlanningTool."""
-        logger.info(f"Creating initial plan with ID: {self.active_plan_id}")
+        logger.info("Creating initial plan with ID: {}", self.active_plan_id)
+        self._next_active_hint = 0
+
+        # Replay a cached plan for semantically similar requests, if enabled
+        if self.semantic_cache is not None:
+            cached_args = await self.semantic_cache.get(request)
+            if cached_args is not None:
+                logger.info("Replaying semantically cached plan")
+                args = {**cached_args, "plan_id": self.active_plan_id}
+                await self.planning_tool.execute(**args)
+                self._ensure_status_capacity()
+                self._invalidate_plan_text_cache()
+                return
 
         # Create a system message for plan creation
         system_message = Message.system_message(
@@ -165,9 +275,9 @@ class PlanningFlow(BaseFlow):
                     args = tool_call.function.arguments
                     if isinstance(args, str):
                         try:
-                            args = json.loads(args)
-                        except json.JSONDecodeError:
-                            logger.error(f"Failed to parse tool arguments: {args}")
+                            args = _json_loads(args)
+                        except ValueError:
+                            logger.error("Failed to parse tool arguments: {}", args)
                             continue
 
                     # Ensure plan_id is set correctly and execute the tool
@@ -176,7 +286,11 @@ class PlanningFlow(BaseFlow):
                     # Execute the tool via ToolCollection instead of directly
                     result = await self.planning_tool.execute(**args)
 
-                    logger.info(f"Plan creation result: {str(result)}")
+                    logger.info("Plan creation result: {}", str(result))
+                    self._ensure_status_capacity()
+                    self._invalidate_plan_text_cache()
+                    if self.semantic_cache is not None:
+                        await self.semantic_cache.put(request, dict(args))
                     return
 
         # If execution reached here, create a default plan
@@ -191,6 +305,29 @@ class PlanningFlow(BaseFlow):
                 "steps": ["Analyze request", "Execute task", "Verify results"],
             }
         )
+        self._ensure_status_capacity()
+        self._invalidate_plan_text_cache()
+
+    def _ensure_status_capacity(self) -> None:
+        """Size step_statuses and step_notes to the step count once, up front.
+
+        Doing this eagerly after plan creation means status writes are plain
+        index assignments with no incremental list growth on the hot path.
+        """
+        plan_data = self.planning_tool.plans.get(self.active_plan_id)
+        if not plan_data:
+            return
+
+        steps = plan_data.get("steps", [])
+        step_statuses = plan_data.setdefault("step_statuses", [])
+        step_notes = plan_data.setdefault("step_notes", [])
+
+        if len(step_statuses) < len(steps):
+            step_statuses.extend(
+                [PlanStepStatus.NOT_STARTED.value] * (len(steps) - len(step_statuses))
+            )
+        if len(step_notes) < len(steps):
+            step_notes.extend([""] * (len(steps) - len(step_notes)))
 
     async def _get_current_step_info(self) -> tuple[Optional[int], Optional[dict]]:
         """
@@ -201,7 +338,7 @@ class PlanningFlow(BaseFlow):
             not self.active_plan_id
             or self.active_plan_id not in self.planning_tool.plans
         ):
-            logger.error(f"Plan with ID {self.active_plan_id} not found")
+            logger.error("Plan with ID {} not found", self.active_plan_id)
             return None, None
 
         try:
@@ -210,23 +347,26 @@ class PlanningFlow(BaseFlow):
             steps = plan_data.get("steps", [])
             step_statuses = plan_data.get("step_statuses", [])
 
-            # Find first non-completed step
-            for i, step in enumerate(steps):
+            # Find first non-completed step. Steps complete front to back, so
+            # start scanning at the hinted index; the chained head range is
+            # lazy and only consumed when the tail holds no active step
+            # (e.g. an earlier step was reopened after a failure).
+            start = min(self._next_active_hint, len(steps))
+            for i in chain(range(start, len(steps)), range(start)):
+                step = steps[i]
                 if i >= len(step_statuses):
                     status = PlanStepStatus.NOT_STARTED.value
                 else:
                     status = step_statuses[i]
 
-                if status in PlanStepStatus.get_active_statuses():
+                if status in _ACTIVE_STATUSES:
                     # Extract step type/category if available
                     step_info = {"text": step}
 
                     # Try to extract step type from the text (e.g., [SEARCH] or [CODE])
-                    import re
-
-                    type_match = re.search(r"\[([A-Z_]+)\]", step)
-                    if type_match:
-                        step_info["type"] = type_match.group(1).lower()
+                    step_type = _extract_step_type(step)
+                    if step_type:
+                        step_info["type"] = step_type
 
                     # Mark current step as in_progress
                     try:
@@ -237,95 +377,289 @@ class PlanningFlow(BaseFlow):
                             step_status=PlanStepStatus.IN_PROGRESS.value,
                         )
                     except Exception as e:
-                        logger.warning(f"Error marking step as in_progress: {e}")
+                        logger.warning("Error marking step as in_progress: {}", e)
                         # Update step status directly if needed
-                        if i < len(step_statuses):
-                            step_statuses[i] = PlanStepStatus.IN_PROGRESS.value
-                        else:
-                            while len(step_statuses) < i:
-                                step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-                            step_statuses.append(PlanStepStatus.IN_PROGRESS.value)
+                        if i >= len(step_statuses):
+                            step_statuses.extend(
+                                [PlanStepStatus.NOT_STARTED.value]
+                                * (i + 1 - len(step_statuses))
+                            )
+                        step_statuses[i] = PlanStepStatus.IN_PROGRESS.value
 
                         plan_data["step_statuses"] = step_statuses
 
+                    self._invalidate_plan_text_cache()
+                    self._next_active_hint = i
                     return i, step_info
 
             return None, None  # No active step found
 
         except Exception as e:
-            logger.warning(f"Error finding current step index: {e}")
+            logger.warning("Error finding current step index: {}", e)
             return None, None
 
-    async def _execute_step(self, executor: BaseAgent, step_info: dict) -> str:
-        """Execute the current step with the specified agent using agent.run()."""
-        # Prepare context for the agent with current plan status
-        plan_status = await self._get_plan_text()
-        step_text = step_info.get("text", f"Step {self.current_step_index}")
+    async def _get_parallel_batch(
+        self, start_index: int, first_step_info: dict
+    ) -> List[Tuple[int, dict]]:
+        """
+        Collect the batch of steps to execute together, starting at start_index.
+        Returns a single-element batch unless the step at start_index and its
+        successors are tagged [PAR] (independent steps safe to run concurrently).
+        """
+        batch = [(start_index, first_step_info)]
 
-        # Create a prompt for the agent to execute the current step
-        step_prompt = f"""
-        CURRENT PLAN STATUS:
-        {plan_status}
+        if "[PAR]" not in first_step_info.get("text", ""):
+            return batch
 
-        YOUR CURRENT TASK:
-        You are now working on step {self.current_step_index}: "{step_text}"
+        try:
+            plan_data = self.planning_tool.plans[self.active_plan_id]
+            steps = plan_data.get("steps", [])
+            step_statuses = plan_data.get("step_statuses", [])
+
+            for i in range(start_index + 1, len(steps)):
+                step = steps[i]
+                status = (
+                    step_statuses[i]
+                    if i < len(step_statuses)
+                    else PlanStepStatus.NOT_STARTED.value
+                )
+
+                # Stop the batch at the first dependent or inactive step
+                if status not in _ACTIVE_STATUSES or "[PAR]" not in step:
+                    break
+
+                step_info = {"text": step}
+                step_type = _extract_step_type(step)
+                if step_type:
+                    step_info["type"] = step_type
+
+                batch.append((i, step_info))
+
+            # Mark the extra batch members in_progress with one batched call
+            # (the first step was already marked by _get_current_step_info)
+            if len(batch) > 1:
+                try:
+                    await self.planning_tool.execute(
+                        command="mark_steps",
+                        plan_id=self.active_plan_id,
+                        step_updates=[
+                            {
+                                "step_index": i,
+                                "step_status": PlanStepStatus.IN_PROGRESS.value,
+                            }
+                            for i, _ in batch[1:]
+                        ],
+                    )
+                except Exception as e:
+                    logger.warning("Error marking steps as in_progress: {}", e)
+                else:
+                    self._invalidate_plan_text_cache()
+        except Exception as e:
+            logger.warning("Error collecting parallel batch: {}", e)
+
+        return batch
 
-        Please execute this step using the appropriate tools. When you're done, provide a summary of what you accomplished.
+    async def _execute_parallel_batch(
+        self, batch: List[Tuple[int, dict]]
+    ) -> Tuple[List[str], List[BaseAgent]]:
         """
+        Join phase for a parallel batch: run the batch's steps through their
+        executors concurrently, then collect results in step order.
+
+        An agent rejects run() re-entry while it is RUNNING, so steps that
+        resolve to the same executor (the default single-agent case) are run
+        sequentially within that executor's lane; only distinct executors
+        actually overlap.
+        """
+        executors = [
+            self.get_executor(step_info.get("type")) for _, step_info in batch
+        ]
+
+        # Group batch positions by executor identity, preserving step order
+        lanes: Dict[int, List[int]] = {}
+        for position, executor in enumerate(executors):
+            lanes.setdefault(id(executor), []).append(position)
+
+        results: List[Union[str, BaseException]] = [None] * len(batch)
+
+        async def run_lane(positions: List[int]) -> None:
+            for position in positions:
+                index, step_info = batch[position]
+                try:
+                    results[position] = await self._execute_step(
+                        executors[position], step_info, step_index=index
+                    )
+                except Exception as e:
+                    results[position] = e
+
+        # Coalesce the batch's completion transitions into one mark_steps call
+        self._defer_status_updates = True
+        try:
+            await asyncio.gather(
+                *[run_lane(positions) for positions in lanes.values()]
+            )
+        finally:
+            self._defer_status_updates = False
+            await self._flush_status_updates()
+
+        step_results = []
+        for (index, _), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                logger.error("Error executing step {}: {}", index, result)
+                step_results.append(f"Error executing step {index}: {result}\n")
+            else:
+                step_results.append(result + "\n")
+
+        return step_results, executors
+
+    async def _execute_step(
+        self, executor: BaseAgent, step_info: dict, step_index: Optional[int] = None
+    ) -> str:
+        """Execute the current step with the specified agent using agent.run()."""
+        if step_index is None:
+            step_index = self.current_step_index
+
+        # Prepare context for the agent with current plan status
+        plan_status = await self._get_plan_text()
+        step_text = step_info.get("text", f"Step {step_index}")
+
+        # Static preamble first, dynamic plan status and task last, so the
+        # shared prefix stays cacheable across all steps of a run
+        step_prompt = (
+            f"{self._STATIC_STEP_PREAMBLE}\n"
+            f"---\n"
+            f"CURRENT PLAN STATUS:\n{plan_status}\n\n"
+            f'YOUR CURRENT TASK:\nYou are now working on step {step_index}: "{step_text}"\n'
+        )
 
         # Use agent.run() to execute the step
         try:
             step_result = await executor.run(step_prompt)
 
             # Mark the step as completed after successful execution
-            await self._mark_step_completed()
+            await self._mark_step_completed(step_index)
 
             return step_result
         except Exception as e:
-            logger.error(f"Error executing step {self.current_step_index}: {e}")
-            return f"Error executing step {self.current_step_index}: {str(e)}"
+            logger.error("Error executing step {}: {}", step_index, e)
+            return f"Error executing step {step_index}: {str(e)}"
+
+    async def _mark_step_completed(self, step_index: Optional[int] = None) -> None:
+        """Mark the given step (current step by default) as completed."""
+        if step_index is None:
+            step_index = self.current_step_index
+        if step_index is None:
+            return
+
+        # Completing the hinted step moves the expected next-active index on
+        if step_index == self._next_active_hint:
+            self._next_active_hint = step_index + 1
 
-    async def _mark_step_completed(self) -> None:
-        """Mark the current step as completed."""
-        if self.current_step_index is None:
+        if self._defer_status_updates:
+            async with self._status_lock:
+                self._pending_status_updates.append(
+                    (step_index, PlanStepStatus.COMPLETED.value)
+                )
             return
 
+        async with self._status_lock:
+            try:
+                # Mark the step as completed
+                await self.planning_tool.execute(
+                    command="mark_step",
+                    plan_id=self.active_plan_id,
+                    step_index=step_index,
+                    step_status=PlanStepStatus.COMPLETED.value,
+                )
+                logger.info(
+                    "Marked step {} as completed in plan {}",
+                    step_index,
+                    self.active_plan_id,
+                )
+            except Exception as e:
+                logger.warning("Failed to update plan status: {}", e)
+                # Update step status directly in planning tool storage
+                if self.active_plan_id in self.planning_tool.plans:
+                    plan_data = self.planning_tool.plans[self.active_plan_id]
+                    step_statuses = plan_data.get("step_statuses", [])
+
+                    # Ensure the step_statuses list is long enough
+                    if step_index >= len(step_statuses):
+                        step_statuses.extend(
+                            [PlanStepStatus.NOT_STARTED.value]
+                            * (step_index + 1 - len(step_statuses))
+                        )
+
+                    # Update the status
+                    step_statuses[step_index] = PlanStepStatus.COMPLETED.value
+                    plan_data["step_statuses"] = step_statuses
+
+            self._invalidate_plan_text_cache()
+
+    async def _flush_status_updates(self) -> None:
+        """Apply accumulated status transitions with a single mark_steps call."""
+        async with self._status_lock:
+            if not self._pending_status_updates:
+                return
+            updates = self._pending_status_updates
+            self._pending_status_updates = []
+
         try:
-            # Mark the step as completed
             await self.planning_tool.execute(
-                command="mark_step",
+                command="mark_steps",
                 plan_id=self.active_plan_id,
-                step_index=self.current_step_index,
-                step_status=PlanStepStatus.COMPLETED.value,
+                step_updates=[
+                    {"step_index": index, "step_status": status}
+                    for index, status in updates
+                ],
             )
             logger.info(
-                f"Marked step {self.current_step_index} as completed in plan {self.active_plan_id}"
+                "Marked {} steps in plan {} in one batch",
+                len(updates),
+                self.active_plan_id,
             )
         except Exception as e:
-            logger.warning(f"Failed to update plan status: {e}")
-            # Update step status directly in planning tool storage
-            if self.active_plan_id in self.planning_tool.plans:
-                plan_data = self.planning_tool.plans[self.active_plan_id]
+            logger.warning("Failed to batch-update plan status: {}", e)
+            # Update step statuses directly in planning tool storage
+            plan_data = self.planning_tool.plans.get(self.active_plan_id)
+            if plan_data is not None:
                 step_statuses = plan_data.get("step_statuses", [])
+                for index, status in updates:
+                    if index >= len(step_statuses):
+                        step_statuses.extend(
+                            [PlanStepStatus.NOT_STARTED.value]
+                            * (index + 1 - len(step_statuses))
+                        )
+                    step_statuses[index] = status
+                plan_data["step_statuses"] = step_statuses
 
-                # Ensure the step_statuses list is long enough
-                while len(step_statuses) <= self.current_step_index:
-                    step_statuses.append(PlanStepStatus.NOT_STARTED.value)
+        self._invalidate_plan_text_cache()
 
-                # Update the status
-                step_statuses[self.current_step_index] = PlanStepStatus.COMPLETED.value
-                plan_data["step_statuses"] = step_statuses
+    def _invalidate_plan_text_cache(self) -> None:
+        """Drop the cached plan text after steps or statuses change."""
+        self._plan_text_cache = None
+        self._plan_version += 1
 
     async def _get_plan_text(self) -> str:
-        """Get the current plan as formatted text."""
+        """Get the current plan as formatted text, cached between status changes."""
+        await self._flush_status_updates()
+
+        if self._plan_text_cache is not None:
+            return self._plan_text_cache
+
         try:
             result = await self.planning_tool.execute(
                 command="get", plan_id=self.active_plan_id
             )
-            return result.output if hasattr(result, "output") else str(result)
+            plan_text = result.output if hasattr(result, "output") else str(result)
         except Exception as e:
-            logger.error(f"Error getting plan: {e}")
-            return self._generate_plan_text_from_storage()
+            logger.error("Error getting plan: {}", e)
+            plan_text = self._generate_plan_text_from_storage()
+
+        # The version header keeps the text byte-stable within a plan version,
+        # so prompt prefixes built from it stay cache-friendly across steps.
+        self._plan_text_cache = f"<!-- v{self._plan_version} -->\n{plan_text}"
+        return self._plan_text_cache
 
     def _generate_plan_text_from_storage(self) -> str:
         """Generate plan text directly from storage if the planning tool fails."""
@@ -340,14 +674,16 @@ class PlanningFlow(BaseFlow):
             step_notes = plan_data.get("step_notes", [])
 
             # Ensure step_statuses and step_notes match the number of steps
-            while len(step_statuses) < len(steps):
-                step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-            while len(step_notes) < len(steps):
-                step_notes.append("")
-
-            # Count steps by status
-            status_counts = {status: 0 for status in PlanStepStatus.get_all_statuses()}
+            if len(step_statuses) < len(steps):
+                step_statuses.extend(
+                    [PlanStepStatus.NOT_STARTED.value]
+                    * (len(steps) - len(step_statuses))
+                )
+            if len(step_notes) < len(steps):
+                step_notes.extend([""] * (len(steps) - len(step_notes)))
 
+            # Count steps by status in a single pass
+            status_counts = dict.fromkeys(PlanStepStatus.get_all_statuses(), 0)
             for status in step_statuses:
                 if status in status_counts:
                     status_counts[status] += 1
@@ -356,69 +692,110 @@ class PlanningFlow(BaseFlow):
             total = len(steps)
             progress = (completed / total) * 100 if total > 0 else 0
 
-            plan_text = f"Plan: {title} (ID: {self.active_plan_id})\n"
-            plan_text += "=" * len(plan_text) + "\n\n"
-
-            plan_text += (
-                f"Progress: {completed}/{total} steps completed ({progress:.1f}%)\n"
-            )
-            plan_text += f"Status: {status_counts[PlanStepStatus.COMPLETED.value]} completed, {status_counts[PlanStepStatus.IN_PROGRESS.value]} in progress, "
-            plan_text += f"{status_counts[PlanStepStatus.BLOCKED.value]} blocked, {status_counts[PlanStepStatus.NOT_STARTED.value]} not started\n\n"
-            plan_text += "Steps:\n"
-
-            status_marks = PlanStepStatus.get_status_marks()
-
-            for i, (step, status, notes) in enumerate(
-                zip(steps, step_statuses, step_notes)
-            ):
-                # Use status marks to indicate step status
-                status_mark = status_marks.get(
-                    status, status_marks[PlanStepStatus.NOT_STARTED.value]
-                )
-
-                plan_text += f"{i}. {status_mark} {step}\n"
-                if notes:
-                    plan_text += f"   Notes: {notes}\n"
-
-            return plan_text
+            # The separator length comes from the short header string, not a
+            # growing accumulated text; build everything with a single join
+            header = f"Plan: {title} (ID: {self.active_plan_id})\n"
+            parts = [
+                header,
+                "=" * len(header),
+                "\n\n",
+                f"Progress: {completed}/{total} steps completed ({progress:.1f}%)\n",
+                f"Status: {status_counts[PlanStepStatus.COMPLETED.value]} completed, {status_counts[PlanStepStatus.IN_PROGRESS.value]} in progress, ",
+                f"{status_counts[PlanStepStatus.BLOCKED.value]} blocked, {status_counts[PlanStepStatus.NOT_STARTED.value]} not started\n\n",
+                "Steps:\n",
+                render_steps(
+                    steps, step_statuses, step_notes, PlanStepStatus.get_status_marks()
+                ),
+            ]
+
+            return "".join(parts)
         except Exception as e:
-            logger.error(f"Error generating plan text from storage: {e}")
+            logger.error("Error generating plan text from storage: {}", e)
             return f"Error: Unable to retrieve plan with ID {self.active_plan_id}"
 
     async def _finalize_plan(self) -> str:
         """Finalize the plan and provide a summary using the flow's LLM directly."""
         plan_text = await self._get_plan_text()
 
-        # Create a summary using the flow's LLM directly
-        try:
-            system_message = Message.system_message(
-                "You are a planning assistant. Your task is to summarize the completed plan."
-            )
+        # Reuse a cached summary for semantically similar plans, if enabled
+        if self.semantic_cache is not None:
+            cached_summary = await self.semantic_cache.get(plan_text)
+            if cached_summary is not None:
+                logger.info("Replaying semantically cached plan summary")
+                return f"Plan completed:\n\n{cached_summary}"
 
-            user_message = Message.user_message(
-                f"The plan has been completed. Here is the final plan status:\n\n{plan_text}\n\nPlease provide a summary of what was accomplished and any final thoughts."
-            )
-
-            response = await self.llm.ask(
-                messages=[user_message], system_msgs=[system_message]
-            )
+        if self.hedged_finalize:
+            return await self._finalize_plan_hedged(plan_text)
 
+        # Create a summary using the flow's LLM directly
+        try:
+            response = await self._summarize_with_llm(plan_text)
             return f"Plan completed:\n\n{response}"
         except Exception as e:
-            logger.error(f"Error finalizing plan with LLM: {e}")
+            logger.error("Error finalizing plan with LLM: {}", e)
 
             # Fallback to using an agent for the summary
             try:
-                agent = self.primary_agent
-                summary_prompt = f"""
-                The plan has been completed. Here is the final plan status:
-
-                {plan_text}
-
-                Please provide a summary of what was accomplished and any final thoughts.
-                """
-                summary = await agent.run(summary_prompt)
+                summary = await self._summarize_with_agent(plan_text)
                 return f"Plan completed:\n\n{summary}"
             except Exception as e2:
-                logger.error(f"Error finalizing plan with agent: {e2}")
+                logger.error("Error finalizing plan with agent: {}", e2)
                 return "Plan completed. Error generating summary."
+
+    async def _summarize_with_llm(self, plan_text: str) -> str:
+        """Summarize the completed plan using the flow's LLM."""
+        system_message = Message.system_message(
+            "You are a planning assistant. Your task is to summarize the completed plan."
+        )
+
+        # Keep the static instructions first and the dynamic plan text last
+        # so the prompt prefix matches across runs for provider caching
+        user_message = Message.user_message(
+            f"The plan has been completed. Please provide a summary of what was accomplished and any final thoughts.\n\nHere is the final plan status:\n\n{plan_text}"
+        )
+
+        response = await self.llm.ask(
+            messages=[user_message], system_msgs=[system_message]
+        )
+
+        if self.semantic_cache is not None:
+            await self.semantic_cache.put(plan_text, response)
+
+        return response
+
+    async def _summarize_with_agent(self, plan_text: str) -> str:
+        """Summarize the completed plan using the primary agent."""
+        summary_prompt = f"""
+        The plan has been completed. Please provide a summary of what was accomplished and any final thoughts.
+
+        Here is the final plan status:
+
+        {plan_text}
+        """
+        return await self.primary_agent.run(summary_prompt)
+
+    async def _finalize_plan_hedged(self, plan_text: str) -> str:
+        """Race the LLM summary against the agent fallback, taking the first
+        success instead of waiting for the LLM call to fail outright."""
+        llm_task = asyncio.create_task(self._summarize_with_llm(plan_text))
+
+        # Give the LLM a head start so fast responses pay no hedging cost
+        await asyncio.sleep(0.5)
+        if llm_task.done() and llm_task.exception() is None:
+            return f"Plan completed:\n\n{llm_task.result()}"
+
+        agent_task = asyncio.create_task(self._summarize_with_agent(plan_text))
+
+        pending = {llm_task, agent_task}
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    for p in pending:
+                        p.cancel()
+                    return f"Plan completed:\n\n{task.result()}"
+                logger.error("Error finalizing plan: {}", task.exception())
+
+        return "Plan completed. Error generating summary."
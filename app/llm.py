@@ -1,22 +1,30 @@
-import math
-from typing import Dict, List, Optional, Union
-
+import asyncio
+import functools
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+import httpx
 import tiktoken
 from openai import (
+    APIConnectionError,
     APIError,
+    APITimeoutError,
     AsyncAzureOpenAI,
     AsyncOpenAI,
     AuthenticationError,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
     OpenAIError,
     RateLimitError,
 )
 from openai.types.chat import ChatCompletion, ChatCompletionMessage
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_random_exponential,
-)
 
 from app.bedrock import BedrockClient
 from app.config import LLMSettings, config
@@ -31,15 +39,135 @@ from app.schema import (
 )
 
 
-REASONING_MODELS = ["o1", "o3-mini"]
-MULTIMODAL_MODELS = [
-    "gpt-4-vision-preview",
-    "gpt-4o",
-    "gpt-4o-mini",
-    "claude-3-opus-20240229",
-    "claude-3-sonnet-20240229",
-    "claude-3-haiku-20240307",
-]
+# Frozen sets: membership is checked on every request and format_messages
+# call, so lookups should hash instead of scanning a list
+REASONING_MODELS = frozenset({"o1", "o3-mini"})
+MULTIMODAL_MODELS = frozenset(
+    {
+        "gpt-4-vision-preview",
+        "gpt-4o",
+        "gpt-4o-mini",
+        "claude-3-opus-20240229",
+        "claude-3-sonnet-20240229",
+        "claude-3-haiku-20240307",
+    }
+)
+
+
+# Transient API failures worth retrying; anything else (validation bugs,
+# TokenLimitExceeded, auth failures, malformed requests) should surface
+# immediately instead of burning six attempts. Deliberately lists concrete
+# classes — the APIError base would sweep in every API exception, including
+# AuthenticationError and BadRequestError.
+_RETRYABLE_ERRORS = (
+    APIConnectionError,
+    APITimeoutError,
+    RateLimitError,
+    InternalServerError,
+)
+_RETRY_ATTEMPTS = 6
+_RETRY_MAX_DELAY = 60.0
+
+
+def _retryable(func):
+    """Retry an API-calling coroutine with jittered exponential backoff.
+
+    Unlike a blanket retry-on-Exception, only transient provider errors are
+    retried, and a RateLimitError sleeps for the provider's retry-after
+    hint when one is present rather than backing off blindly.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        delay = 1.0
+        for attempt in range(1, _RETRY_ATTEMPTS + 1):
+            try:
+                return await func(*args, **kwargs)
+            except _RETRYABLE_ERRORS as e:
+                if attempt == _RETRY_ATTEMPTS:
+                    raise
+
+                sleep_for = delay + random.uniform(0, delay)
+                if isinstance(e, RateLimitError):
+                    response = getattr(e, "response", None)
+                    hint = (
+                        response.headers.get("retry-after")
+                        if response is not None
+                        else None
+                    )
+                    if hint:
+                        try:
+                            sleep_for = float(hint)
+                        except ValueError:
+                            pass
+
+                sleep_for = min(sleep_for, _RETRY_MAX_DELAY)
+                logger.warning(
+                    f"{func.__name__} failed with {type(e).__name__}; "
+                    f"retrying in {sleep_for:.1f}s (attempt {attempt}/{_RETRY_ATTEMPTS})"
+                )
+                await asyncio.sleep(sleep_for)
+                delay = min(delay * 2, _RETRY_MAX_DELAY)
+
+    return wrapper
+
+
+# One tuned HTTP client shared by every LLM singleton. The SDK's default
+# connection pool saturates under concurrent multi-agent traffic; a larger
+# shared pool keeps requests on reused keep-alive connections instead
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _make_http_client() -> httpx.AsyncClient:
+    """Return the shared httpx client used by all OpenAI-compatible clients"""
+    global _http_client
+    if _http_client is None:
+        _http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=256, max_keepalive_connections=256)
+        )
+    return _http_client
+
+
+# Memoized token counts keyed by tokenizer identity and text. Agents resend
+# largely identical role strings, system prompts, and history each turn, so
+# repeated counts become dict lookups instead of tiktoken calls. Bounded with
+# FIFO eviction; tokenizers live in LLM singletons so their ids are stable.
+_TOKEN_COUNT_CACHE: Dict[tuple, int] = {}
+_TOKEN_COUNT_CACHE_MAX = 4096
+
+
+class _StreamPrinter:
+    """Echoes streamed deltas to stdout with batched flushes.
+
+    print(..., flush=True) per delta issues a write+flush syscall pair per
+    token, which can dominate wall time on fast streams; flushing every few
+    chunks (or after a short interval) keeps output live at a fraction of
+    the cost.
+    """
+
+    FLUSH_EVERY_CHUNKS = 16
+    FLUSH_INTERVAL = 0.05  # seconds
+
+    def __init__(self):
+        self._pending_chunks = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, text: str) -> None:
+        sys.stdout.write(text)
+        self._pending_chunks += 1
+        now = time.monotonic()
+        if (
+            self._pending_chunks >= self.FLUSH_EVERY_CHUNKS
+            or now - self._last_flush > self.FLUSH_INTERVAL
+        ):
+            sys.stdout.flush()
+            self._pending_chunks = 0
+            self._last_flush = now
+
+    def close(self) -> None:
+        """Write the trailing newline and drain anything still buffered"""
+        sys.stdout.write("\n")
+        sys.stdout.flush()
 
 
 class TokenCounter:
@@ -54,12 +182,41 @@ class TokenCounter:
     HIGH_DETAIL_TARGET_SHORT_SIDE = 768
     TILE_SIZE = 512
 
-    def __init__(self, tokenizer):
+    # Below this many strings, thread-pool startup costs more than the
+    # parallel encode saves
+    ENCODE_THREAD_THRESHOLD = 64
+
+    def __init__(self, tokenizer, num_threads: Optional[int] = None):
         self.tokenizer = tokenizer
+        # Fixed encode_batch thread count; None sizes it per batch
+        self.num_threads = num_threads
+        # Roles come from a fixed four-value set, so counting them once up
+        # front turns every message's role into a dict lookup
+        self._role_tokens = {
+            role: len(tokenizer.encode(role)) for role in ROLE_VALUES
+        }
+
+    def _encode_threads(self, batch_size: int) -> int:
+        """Pick the encode_batch thread count for a batch of this size"""
+        if self.num_threads is not None:
+            return self.num_threads
+        if batch_size < self.ENCODE_THREAD_THRESHOLD:
+            return 1
+        return min(8, os.cpu_count() or 1)
 
     def count_text(self, text: str) -> int:
         """Calculate tokens for a text string"""
-        return 0 if not text else len(self.tokenizer.encode(text))
+        if not text:
+            return 0
+
+        key = (id(self.tokenizer), text)
+        count = _TOKEN_COUNT_CACHE.get(key)
+        if count is None:
+            count = len(self.tokenizer.encode(text))
+            if len(_TOKEN_COUNT_CACHE) >= _TOKEN_COUNT_CACHE_MAX:
+                _TOKEN_COUNT_CACHE.pop(next(iter(_TOKEN_COUNT_CACHE)))
+            _TOKEN_COUNT_CACHE[key] = count
+        return count
 
     def count_image(self, image_item: dict) -> int:
         """
@@ -94,25 +251,20 @@ class TokenCounter:
 
     def _calculate_high_detail_tokens(self, width: int, height: int) -> int:
         """Calculate tokens for high detail images based on dimensions"""
-        # Step 1: Scale to fit in MAX_SIZE x MAX_SIZE square
-        if width > self.MAX_SIZE or height > self.MAX_SIZE:
-            scale = self.MAX_SIZE / max(width, height)
-            width = int(width * scale)
-            height = int(height * scale)
-
-        # Step 2: Scale so shortest side is HIGH_DETAIL_TARGET_SHORT_SIDE
-        scale = self.HIGH_DETAIL_TARGET_SHORT_SIDE / min(width, height)
-        scaled_width = int(width * scale)
-        scaled_height = int(height * scale)
-
-        # Step 3: Count number of 512px tiles
-        tiles_x = math.ceil(scaled_width / self.TILE_SIZE)
-        tiles_y = math.ceil(scaled_height / self.TILE_SIZE)
-        total_tiles = tiles_x * tiles_y
-
-        # Step 4: Calculate final token count
+        # The MAX_SIZE pre-clamp rescales both sides by the same factor,
+        # which cancels when the short side is then scaled to the 768px
+        # target — so one integer ceil-division per axis yields the tile
+        # counts directly, with no intermediate float scaling passes
+        divisor = min(width, height) * self.TILE_SIZE
+        tiles_x = (
+            width * self.HIGH_DETAIL_TARGET_SHORT_SIDE + divisor - 1
+        ) // divisor
+        tiles_y = (
+            height * self.HIGH_DETAIL_TARGET_SHORT_SIDE + divisor - 1
+        ) // divisor
+
         return (
-            total_tiles * self.HIGH_DETAIL_TILE_TOKENS
+            tiles_x * tiles_y * self.HIGH_DETAIL_TILE_TOKENS
         ) + self.LOW_DETAIL_IMAGE_TOKENS
 
     def count_content(self, content: Union[str, List[Union[str, dict]]]) -> int:
@@ -125,106 +277,251 @@ class TokenCounter:
 
         token_count = 0
         for item in content:
+            # Empty strings and empty dicts tokenize to nothing; skip them
+            # before any branching
+            if not item:
+                continue
             if isinstance(item, str):
                 token_count += self.count_text(item)
             elif isinstance(item, dict):
                 if "text" in item:
-                    token_count += self.count_text(item["text"])
+                    if item["text"]:
+                        token_count += self.count_text(item["text"])
                 elif "image_url" in item:
                     token_count += self.count_image(item)
         return token_count
 
     def count_tool_calls(self, tool_calls: List[dict]) -> int:
         """Calculate tokens for tool calls"""
+        # Repeated argument blobs hit the per-string memo in count_text, so
+        # unchanged tool rounds cost dict lookups rather than re-encoding
         token_count = 0
         for tool_call in tool_calls:
-            if "function" in tool_call:
-                function = tool_call["function"]
-                token_count += self.count_text(function.get("name", ""))
-                token_count += self.count_text(function.get("arguments", ""))
+            function = tool_call.get("function")
+            if not function:
+                continue
+            if function.get("name"):
+                token_count += self.count_text(function["name"])
+            if function.get("arguments"):
+                token_count += self.count_text(function["arguments"])
         return token_count
 
-    def count_message_tokens(self, messages: List[dict]) -> int:
-        """Calculate the total number of tokens in a message list"""
-        total_tokens = self.FORMAT_TOKENS  # Base format tokens
-
-        for message in messages:
-            tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+    def _collect_content_strings(
+        self, content: Union[str, List[Union[str, dict]]], texts: List[str]
+    ) -> int:
+        """Collect content text into texts; return tokens for image items"""
+        if not content:
+            return 0
 
-            # Add role tokens
-            tokens += self.count_text(message.get("role", ""))
+        if isinstance(content, str):
+            texts.append(content)
+            return 0
 
-            # Add content tokens
-            if "content" in message:
-                tokens += self.count_content(message["content"])
+        image_tokens = 0
+        for item in content:
+            if isinstance(item, str):
+                if item:
+                    texts.append(item)
+            elif isinstance(item, dict):
+                if "text" in item:
+                    if item["text"]:
+                        texts.append(item["text"])
+                elif "image_url" in item:
+                    image_tokens += self.count_image(item)
+        return image_tokens
 
-            # Add tool calls tokens
-            if "tool_calls" in message:
-                tokens += self.count_tool_calls(message["tool_calls"])
+    def _collect_tool_call_strings(
+        self, tool_calls: List[dict], texts: List[str]
+    ) -> None:
+        """Collect the text fields of tool calls into texts"""
+        for tool_call in tool_calls:
+            if "function" in tool_call:
+                function = tool_call["function"]
+                if function.get("name"):
+                    texts.append(function["name"])
+                if function.get("arguments"):
+                    texts.append(function["arguments"])
 
-            # Add name and tool_call_id tokens
-            tokens += self.count_text(message.get("name", ""))
-            tokens += self.count_text(message.get("tool_call_id", ""))
+    def count_message_tokens(self, messages: List[dict]) -> int:
+        """Calculate the total number of tokens in a message list"""
+        # Per-message base tokens are a single multiply instead of an add
+        # inside the loop; bound methods are hoisted so the long-trace loop
+        # skips repeated attribute lookups
+        total_tokens = self.FORMAT_TOKENS + self.BASE_MESSAGE_TOKENS * len(messages)
+
+        # Collect every text field first so tiktoken is crossed once for the
+        # whole batch rather than once per field; fixed-cost tokens (message
+        # overhead, images) are added as plain integers during traversal
+        texts: List[str] = []
+        append = texts.append
+        collect_content = self._collect_content_strings
+        collect_tool_calls = self._collect_tool_call_strings
+        role_tokens = self._role_tokens
+        for message in messages:
+            # Role tokens, precounted for the standard roles
+            role = message.get("role")
+            if role:
+                count = role_tokens.get(role)
+                if count is not None:
+                    total_tokens += count
+                else:
+                    append(role)
+
+            # Content tokens (image tokens are counted inline)
+            content = message.get("content")
+            if content:
+                total_tokens += collect_content(content, texts)
+
+            # Tool calls tokens
+            tool_calls = message.get("tool_calls")
+            if tool_calls:
+                collect_tool_calls(tool_calls, texts)
+
+            # Name and tool_call_id tokens
+            if message.get("name"):
+                append(message["name"])
+            if message.get("tool_call_id"):
+                append(message["tool_call_id"])
+
+        if texts:
+            # Serve repeated strings (roles, unchanged history, tool blobs)
+            # from the memo and batch-encode only the misses
+            tokenizer_id = id(self.tokenizer)
+            cache_get = _TOKEN_COUNT_CACHE.get
+            misses: List[str] = []
+            miss = misses.append
+            for text in texts:
+                count = cache_get((tokenizer_id, text))
+                if count is None:
+                    miss(text)
+                else:
+                    total_tokens += count
 
-            total_tokens += tokens
+            if misses:
+                encoded = self.tokenizer.encode_batch(
+                    misses, num_threads=self._encode_threads(len(misses))
+                )
+                # map/sum keep the length arithmetic in C instead of a
+                # Python-level accumulation loop
+                counts = list(map(len, encoded))
+                total_tokens += sum(counts)
+                for text, count in zip(misses, counts):
+                    if len(_TOKEN_COUNT_CACHE) >= _TOKEN_COUNT_CACHE_MAX:
+                        _TOKEN_COUNT_CACHE.pop(next(iter(_TOKEN_COUNT_CACHE)))
+                    _TOKEN_COUNT_CACHE[(tokenizer_id, text)] = count
 
         return total_tokens
 
 
 class LLM:
     _instances: Dict[str, "LLM"] = {}
+    _instances_lock = threading.Lock()
+
+    # Tokenizers keyed by encoding name; configs whose models resolve to the
+    # same encoding (commonly cl100k_base) share one instance and its
+    # Rust-side table instead of holding duplicates
+    _tokenizers: Dict[str, "tiktoken.Encoding"] = {}
+
+    @classmethod
+    def _get_tokenizer(cls, model: str) -> "tiktoken.Encoding":
+        """Resolve the tokenizer for a model, shared across instances"""
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            # If the model is not in tiktoken's presets, use cl100k_base as default
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return cls._tokenizers.setdefault(encoding.name, encoding)
 
     def __new__(
         cls, config_name: str = "default", llm_config: Optional[LLMSettings] = None
     ):
-        if config_name not in cls._instances:
-            instance = super().__new__(cls)
-            instance.__init__(config_name, llm_config)
-            cls._instances[config_name] = instance
-        return cls._instances[config_name]
+        # Unlocked hit serves the common path; the lock makes concurrent
+        # first use construct exactly one fully initialized instance
+        instance = cls._instances.get(config_name)
+        if instance is None:
+            with cls._instances_lock:
+                instance = cls._instances.get(config_name)
+                if instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_once(config_name, llm_config)
+                    cls._instances[config_name] = instance
+        return instance
 
     def __init__(
         self, config_name: str = "default", llm_config: Optional[LLMSettings] = None
     ):
-        if not hasattr(self, "client"):  # Only initialize if not already initialized
-            llm_config = llm_config or config.llm
-            llm_config = llm_config.get(config_name, llm_config["default"])
-            self.model = llm_config.model
-            self.max_tokens = llm_config.max_tokens
-            self.temperature = llm_config.temperature
-            self.api_type = llm_config.api_type
-            self.api_key = llm_config.api_key
-            self.api_version = llm_config.api_version
-            self.base_url = llm_config.base_url
-
-            # Add token counting related attributes
-            self.total_input_tokens = 0
-            self.total_completion_tokens = 0
-            self.max_input_tokens = (
-                llm_config.max_input_tokens
-                if hasattr(llm_config, "max_input_tokens")
-                else None
+        # Initialization happens in _init_once from __new__; Python still
+        # calls __init__ on every LLM(...) lookup, so it must stay a no-op
+        pass
+
+    def _init_once(
+        self, config_name: str = "default", llm_config: Optional[LLMSettings] = None
+    ):
+        llm_config = llm_config or config.llm
+        llm_config = llm_config.get(config_name, llm_config["default"])
+        self.model = llm_config.model
+        self.max_tokens = llm_config.max_tokens
+        self.temperature = llm_config.temperature
+
+        # Model capabilities are fixed for the life of the instance, so the
+        # per-request membership checks collapse to attribute reads
+        self.supports_images = self.model in MULTIMODAL_MODELS
+        self.is_reasoning = self.model in REASONING_MODELS
+
+        # Invariant request parameters, copied into each call's params
+        if self.is_reasoning:
+            self._base_params_template = {
+                "model": self.model,
+                "max_completion_tokens": self.max_tokens,
+            }
+        else:
+            self._base_params_template = {
+                "model": self.model,
+                "max_tokens": self.max_tokens,
+            }
+        self.api_type = llm_config.api_type
+        self.api_key = llm_config.api_key
+        self.api_version = llm_config.api_version
+        self.base_url = llm_config.base_url
+
+        # Add token counting related attributes
+        self.total_input_tokens = 0
+        self.total_completion_tokens = 0
+        self.max_input_tokens = (
+            llm_config.max_input_tokens
+            if hasattr(llm_config, "max_input_tokens")
+            else None
+        )
+
+        # Initialize tokenizer (shared across instances by encoding)
+        self.tokenizer = LLM._get_tokenizer(self.model)
+
+        if self.api_type == "azure":
+            self.client = AsyncAzureOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                api_version=self.api_version,
+                http_client=_make_http_client(),
+            )
+        elif self.api_type == "aws":
+            self.client = BedrockClient()
+        else:
+            self.client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=_make_http_client(),
             )
 
-            # Initialize tokenizer
-            try:
-                self.tokenizer = tiktoken.encoding_for_model(self.model)
-            except KeyError:
-                # If the model is not in tiktoken's presets, use cl100k_base as default
-                self.tokenizer = tiktoken.get_encoding("cl100k_base")
-
-            if self.api_type == "azure":
-                self.client = AsyncAzureOpenAI(
-                    base_url=self.base_url,
-                    api_key=self.api_key,
-                    api_version=self.api_version,
-                )
-            elif self.api_type == "aws":
-                self.client = BedrockClient()
-            else:
-                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.token_counter = TokenCounter(self.tokenizer)
+
+        # Token counts of tool schemas keyed by canonical JSON hash;
+        # tools rarely change between turns, so each schema is
+        # tokenized once per process instead of once per request
+        self._tool_token_cache: Dict[bytes, int] = {}
 
-            self.token_counter = TokenCounter(self.tokenizer)
+        # Formatted system messages keyed by their content, so retries and
+        # repeat turns skip re-formatting the same prompt
+        self._system_fmt_cache: Dict[tuple, List[dict]] = {}
 
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
@@ -235,6 +532,24 @@ class LLM:
     def count_message_tokens(self, messages: List[dict]) -> int:
         return self.token_counter.count_message_tokens(messages)
 
+    def count_tool_tokens(self, tool: dict) -> int:
+        """Calculate the number of tokens in a tool schema, with caching.
+
+        Counts the canonical JSON serialization — what the API actually
+        receives — rather than Python's str(dict) rendering.
+        """
+        try:
+            canonical = json.dumps(tool, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            canonical = str(tool)
+
+        key = hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+        count = self._tool_token_cache.get(key)
+        if count is None:
+            count = self.count_tokens(canonical)
+            self._tool_token_cache[key] = count
+        return count
+
     def update_token_count(self, input_tokens: int, completion_tokens: int = 0) -> None:
         """Update token counts"""
         # Only track tokens if max_input_tokens is set
@@ -292,78 +607,145 @@ class LLM:
         formatted_messages = []
 
         for message in messages:
+            # Dicts stamped by a previous pass are already converted and
+            # validated (multi-turn history is mostly such dicts), so they
+            # skip straight through
+            if isinstance(message, dict):
+                if message.get("__formatted__"):
+                    formatted_messages.append(message)
+                    continue
             # Convert Message objects to dictionaries
-            if isinstance(message, Message):
+            elif isinstance(message, Message):
                 message = message.to_dict()
+            else:
+                raise TypeError(f"Unsupported message type: {type(message)}")
 
-            if isinstance(message, dict):
-                # If message is a dict, ensure it has required fields
-                if "role" not in message:
-                    raise ValueError("Message dict must contain 'role' field")
+            # If message is a dict, ensure it has required fields
+            if "role" not in message:
+                raise ValueError("Message dict must contain 'role' field")
+
+            # Process base64 images if present; the field is stripped either
+            # way since the API does not accept it
+            base64_image = message.get("base64_image")
+            if base64_image:
+                del message["base64_image"]
 
-                # Process base64 images if present and model supports images
-                if supports_images and message.get("base64_image"):
+                if supports_images:
                     # Initialize or convert content to appropriate format
-                    if not message.get("content"):
-                        message["content"] = []
-                    elif isinstance(message["content"], str):
-                        message["content"] = [
-                            {"type": "text", "text": message["content"]}
-                        ]
-                    elif isinstance(message["content"], list):
+                    content = message.get("content")
+                    if not content:
+                        content = []
+                    elif isinstance(content, str):
+                        content = [{"type": "text", "text": content}]
+                    elif any(isinstance(item, str) for item in content):
                         # Convert string items to proper text objects
-                        message["content"] = [
+                        content = [
                             (
                                 {"type": "text", "text": item}
                                 if isinstance(item, str)
                                 else item
                             )
-                            for item in message["content"]
+                            for item in content
                         ]
+                    else:
+                        # Already multimodal dicts; shallow-copy instead of
+                        # rebuilding item by item
+                        content = list(content)
 
                     # Add the image to content
-                    message["content"].append(
+                    content.append(
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{message['base64_image']}"
+                                "url": f"data:image/jpeg;base64,{base64_image}"
                             },
                         }
                     )
+                    message["content"] = content
 
-                    # Remove the base64_image field
-                    del message["base64_image"]
-                # If model doesn't support images but message has base64_image, handle gracefully
-                elif not supports_images and message.get("base64_image"):
-                    # Just remove the base64_image field and keep the text content
-                    del message["base64_image"]
+            if "content" in message or "tool_calls" in message:
+                # Validate the role inline instead of re-walking the
+                # formatted list in a second pass
+                if message["role"] not in ROLE_VALUES:
+                    raise ValueError(f"Invalid role: {message['role']}")
+                message["__formatted__"] = True
+                formatted_messages.append(message)
+            # else: do not include the message
 
-                if "content" in message or "tool_calls" in message:
-                    formatted_messages.append(message)
-                # else: do not include the message
+        return formatted_messages
+
+    @staticmethod
+    def strip_formatted(messages: List[dict]) -> List[dict]:
+        """Drop the internal __formatted__ stamp before dicts go on the wire"""
+        return [
+            (
+                {k: v for k, v in message.items() if k != "__formatted__"}
+                if "__formatted__" in message
+                else message
+            )
+            for message in messages
+        ]
+
+    @staticmethod
+    def _system_fmt_key(
+        system_msgs: List[Union[dict, Message]], supports_images: bool
+    ) -> Optional[tuple]:
+        """Build a content-based cache key, or None when uncacheable.
+
+        Only plain-string system prompts are cached; anything carrying
+        images or structured content falls through to a fresh format.
+        """
+        parts = [supports_images]
+        for message in system_msgs:
+            if isinstance(message, Message):
+                if message.base64_image:
+                    return None
+                role, content = message.role, message.content
+            elif isinstance(message, dict):
+                if message.get("base64_image"):
+                    return None
+                role, content = message.get("role"), message.get("content")
             else:
-                raise TypeError(f"Unsupported message type: {type(message)}")
+                return None
+            if content is not None and not isinstance(content, str):
+                return None
+            parts.append((role, content))
+        return tuple(parts)
 
-        # Validate all messages have required fields
-        for msg in formatted_messages:
-            if msg["role"] not in ROLE_VALUES:
-                raise ValueError(f"Invalid role: {msg['role']}")
+    def format_system_messages(
+        self,
+        system_msgs: List[Union[dict, Message]],
+        supports_images: bool = False,
+    ) -> List[dict]:
+        """Format system messages, reusing the result across calls and retries.
 
-        return formatted_messages
+        The same system prompt is typically resent every turn (often in a
+        freshly built list), so the formatted result is cached by message
+        content rather than rebuilt on every request and every retry.
+        """
+        key = self._system_fmt_key(system_msgs, supports_images)
+        if key is None:
+            return self.format_messages(system_msgs, supports_images)
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
+        cached = self._system_fmt_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if len(self._system_fmt_cache) >= 256:
+            self._system_fmt_cache.clear()
+
+        formatted = self.format_messages(system_msgs, supports_images)
+        self._system_fmt_cache[key] = formatted
+        return formatted
+
+    @_retryable
     async def ask(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = True,
         temperature: Optional[float] = None,
+        on_chunk: Optional[Callable[[str], None]] = None,
     ) -> str:
         """
         Send a prompt to the LLM and get the response.
@@ -373,6 +755,8 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            on_chunk: Optional callback receiving each streamed delta;
+                when omitted, deltas are echoed to stdout
 
         Returns:
             str: The generated response
@@ -385,33 +769,34 @@ class LLM:
         """
         try:
             # Check if the model supports images
-            supports_images = self.model in MULTIMODAL_MODELS
+            supports_images = self.supports_images
 
             # Format system and user messages with image support check
             if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
+                system_msgs = self.format_system_messages(system_msgs, supports_images)
                 messages = system_msgs + self.format_messages(messages, supports_images)
             else:
                 messages = self.format_messages(messages, supports_images)
 
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
+            # Pre-call token counting exists only to enforce the input
+            # limit; without a configured limit it is dead work, and the
+            # API reports exact usage afterwards anyway
+            input_tokens = 0
+            if self.max_input_tokens is not None:
+                input_tokens = self.count_message_tokens(messages)
 
-            # Check if token limits are exceeded
-            if not self.check_token_limit(input_tokens):
-                error_message = self.get_limit_error_message(input_tokens)
-                # Raise a special exception that won't be retried
-                raise TokenLimitExceeded(error_message)
+                # Check if token limits are exceeded
+                if not self.check_token_limit(input_tokens):
+                    error_message = self.get_limit_error_message(input_tokens)
+                    # Raise a special exception that won't be retried
+                    raise TokenLimitExceeded(error_message)
 
             params = {
-                "model": self.model,
-                "messages": messages,
+                **self._base_params_template,
+                "messages": self.strip_formatted(messages),
             }
 
-            if self.model in REASONING_MODELS:
-                params["max_completion_tokens"] = self.max_tokens
-            else:
-                params["max_tokens"] = self.max_tokens
+            if not self.is_reasoning:
                 params["temperature"] = (
                     temperature if temperature is not None else self.temperature
                 )
@@ -432,30 +817,48 @@ class LLM:
 
                 return response.choices[0].message.content
 
-            # Streaming request, For streaming, update estimated token count before making the request
-            self.update_token_count(input_tokens)
-
-            response = await self.client.chat.completions.create(**params, stream=True)
+            # Streaming request; token counts are recorded after the stream
+            # ends, from provider-reported usage when available
+            # Ask the provider to report usage on the final stream chunk so
+            # the response doesn't have to be re-tokenized afterwards
+            response = await self.client.chat.completions.create(
+                **params, stream=True, stream_options={"include_usage": True}
+            )
 
-            collected_messages = []
-            completion_text = ""
+            # One StringIO accumulator replaces the parallel chunk list and
+            # quadratic string concatenation the loop used to maintain
+            buf = io.StringIO()
+            usage = None
+            # A custom callback (e.g. a web UI sink) replaces the stdout
+            # echo entirely, keeping terminal I/O off the hot path
+            printer = _StreamPrinter() if on_chunk is None else None
             async for chunk in response:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
                 chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                completion_text += chunk_message
-                print(chunk_message, end="", flush=True)
+                buf.write(chunk_message)
+                if printer is not None:
+                    printer.write(chunk_message)
+                else:
+                    on_chunk(chunk_message)
 
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
+            if printer is not None:
+                printer.close()  # Newline after streaming
+            full_response = buf.getvalue().strip()
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
 
-            # estimate completion tokens for streaming response
-            completion_tokens = self.count_tokens(completion_text)
-            logger.info(
-                f"Estimated completion tokens for streaming response: {completion_tokens}"
-            )
-            self.total_completion_tokens += completion_tokens
+            if usage is not None:
+                self.update_token_count(usage.prompt_tokens, usage.completion_tokens)
+            else:
+                # Provider sent no usage; estimate by tokenizing the response
+                completion_tokens = self.count_tokens(full_response)
+                logger.info(
+                    f"Estimated completion tokens for streaming response: {completion_tokens}"
+                )
+                self.update_token_count(input_tokens, completion_tokens)
 
             return full_response
 
@@ -478,13 +881,7 @@ class LLM:
             logger.exception(f"Unexpected error in ask")
             raise
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
+    @_retryable
     async def ask_with_images(
         self,
         messages: List[Union[dict, Message]],
@@ -492,6 +889,7 @@ class LLM:
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = False,
         temperature: Optional[float] = None,
+        on_chunk: Optional[Callable[[str], None]] = None,
     ) -> str:
         """
         Send a prompt with images to the LLM and get the response.
@@ -502,6 +900,8 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            on_chunk: Optional callback receiving each streamed delta;
+                when omitted, deltas are echoed to stdout
 
         Returns:
             str: The generated response
@@ -515,9 +915,9 @@ class LLM:
         try:
             # For ask_with_images, we always set supports_images to True because
             # this method should only be called with models that support images
-            if self.model not in MULTIMODAL_MODELS:
+            if not self.supports_images:
                 raise ValueError(
-                    f"Model {self.model} does not support images. Use a model from {MULTIMODAL_MODELS}"
+                    f"Model {self.model} does not support images. Use a model from {sorted(MULTIMODAL_MODELS)}"
                 )
 
             # Format messages with image support
@@ -561,29 +961,28 @@ class LLM:
             # Add system messages if provided
             if system_msgs:
                 all_messages = (
-                    self.format_messages(system_msgs, supports_images=True)
+                    self.format_system_messages(system_msgs, supports_images=True)
                     + formatted_messages
                 )
             else:
                 all_messages = formatted_messages
 
-            # Calculate tokens and check limits
-            input_tokens = self.count_message_tokens(all_messages)
-            if not self.check_token_limit(input_tokens):
-                raise TokenLimitExceeded(self.get_limit_error_message(input_tokens))
+            # Calculate tokens and check limits (skipped when no limit set)
+            input_tokens = 0
+            if self.max_input_tokens is not None:
+                input_tokens = self.count_message_tokens(all_messages)
+                if not self.check_token_limit(input_tokens):
+                    raise TokenLimitExceeded(self.get_limit_error_message(input_tokens))
 
             # Set up API parameters
             params = {
-                "model": self.model,
-                "messages": all_messages,
+                **self._base_params_template,
+                "messages": self.strip_formatted(all_messages),
                 "stream": stream,
             }
 
             # Add model-specific parameters
-            if self.model in REASONING_MODELS:
-                params["max_completion_tokens"] = self.max_tokens
-            else:
-                params["max_tokens"] = self.max_tokens
+            if not self.is_reasoning:
                 params["temperature"] = (
                     temperature if temperature is not None else self.temperature
                 )
@@ -602,14 +1001,19 @@ class LLM:
             self.update_token_count(input_tokens)
             response = await self.client.chat.completions.create(**params)
 
-            collected_messages = []
+            buf = io.StringIO()
+            printer = _StreamPrinter() if on_chunk is None else None
             async for chunk in response:
                 chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
+                buf.write(chunk_message)
+                if printer is not None:
+                    printer.write(chunk_message)
+                else:
+                    on_chunk(chunk_message)
 
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
+            if printer is not None:
+                printer.close()  # Newline after streaming
+            full_response = buf.getvalue().strip()
 
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
@@ -634,13 +1038,7 @@ class LLM:
             logger.error(f"Unexpected error in ask_with_images: {e}")
             raise
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
+    @_retryable
     async def ask_tool(
         self,
         messages: List[Union[dict, Message]],
@@ -678,31 +1076,30 @@ class LLM:
                 raise ValueError(f"Invalid tool_choice: {tool_choice}")
 
             # Check if the model supports images
-            supports_images = self.model in MULTIMODAL_MODELS
+            supports_images = self.supports_images
 
             # Format messages
             if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
+                system_msgs = self.format_system_messages(system_msgs, supports_images)
                 messages = system_msgs + self.format_messages(messages, supports_images)
             else:
                 messages = self.format_messages(messages, supports_images)
 
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
-
-            # If there are tools, calculate token count for tool descriptions
-            tools_tokens = 0
-            if tools:
-                for tool in tools:
-                    tools_tokens += self.count_tokens(str(tool))
+            # Pre-call counting only serves the input limit check; the API
+            # response carries exact usage for accounting
+            if self.max_input_tokens is not None:
+                input_tokens = self.count_message_tokens(messages)
 
-            input_tokens += tools_tokens
+                # If there are tools, calculate token count for tool descriptions
+                if tools:
+                    for tool in tools:
+                        input_tokens += self.count_tool_tokens(tool)
 
-            # Check if token limits are exceeded
-            if not self.check_token_limit(input_tokens):
-                error_message = self.get_limit_error_message(input_tokens)
-                # Raise a special exception that won't be retried
-                raise TokenLimitExceeded(error_message)
+                # Check if token limits are exceeded
+                if not self.check_token_limit(input_tokens):
+                    error_message = self.get_limit_error_message(input_tokens)
+                    # Raise a special exception that won't be retried
+                    raise TokenLimitExceeded(error_message)
 
             # Validate tools if provided
             if tools:
@@ -712,18 +1109,15 @@ class LLM:
 
             # Set up the completion request
             params = {
-                "model": self.model,
-                "messages": messages,
+                **self._base_params_template,
+                "messages": self.strip_formatted(messages),
                 "tools": tools,
                 "tool_choice": tool_choice,
                 "timeout": timeout,
                 **kwargs,
             }
 
-            if self.model in REASONING_MODELS:
-                params["max_completion_tokens"] = self.max_tokens
-            else:
-                params["max_tokens"] = self.max_tokens
+            if not self.is_reasoning:
                 params["temperature"] = (
                     temperature if temperature is not None else self.temperature
                 )
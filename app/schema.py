@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class Role(str, Enum):
@@ -160,23 +160,57 @@ class Memory(BaseModel):
     messages: List[Message] = Field(default_factory=list)
     max_messages: int = Field(default=100)
 
+    # Rolling counts of assistant message contents, kept in sync with
+    # `messages` so duplicate detection is O(1) instead of a full scan
+    _assistant_content_counts: Dict[int, int] = PrivateAttr(default_factory=dict)
+
+    def _adjust_content_count(self, message: Message, delta: int) -> None:
+        """Update the rolling duplicate counter for an added/removed message"""
+        if message.role == Role.ASSISTANT.value and message.content:
+            content_hash = hash(message.content)
+            count = self._assistant_content_counts.get(content_hash, 0) + delta
+            if count > 0:
+                self._assistant_content_counts[content_hash] = count
+            else:
+                self._assistant_content_counts.pop(content_hash, None)
+
+    def _trim_messages(self) -> None:
+        """Enforce the message limit, keeping duplicate counts in sync"""
+        if len(self.messages) > self.max_messages:
+            for dropped in self.messages[: -self.max_messages]:
+                self._adjust_content_count(dropped, -1)
+            self.messages = self.messages[-self.max_messages :]
+
     def add_message(self, message: Message) -> None:
         """Add a message to memory"""
         self.messages.append(message)
+        self._adjust_content_count(message, 1)
         # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._trim_messages()
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
         self.messages.extend(messages)
+        for message in messages:
+            self._adjust_content_count(message, 1)
         # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._trim_messages()
+
+    def set_messages(self, messages: List[Message]) -> None:
+        """Replace all messages, rebuilding the duplicate counts"""
+        self.messages = messages
+        self._assistant_content_counts.clear()
+        for message in messages:
+            self._adjust_content_count(message, 1)
+
+    def duplicate_count(self, content: str) -> int:
+        """Count assistant messages currently in memory with this content"""
+        return self._assistant_content_counts.get(hash(content), 0)
 
     def clear(self) -> None:
         """Clear all messages"""
         self.messages.clear()
+        self._assistant_content_counts.clear()
 
     def get_recent_messages(self, n: int) -> List[Message]:
         """Get n most recent messages"""
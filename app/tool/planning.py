@@ -10,6 +10,34 @@ A planning tool that allows the agent to create and manage plans for solving com
 The tool provides functionality for creating plans, updating plan steps, and tracking progress.
 """
 
+# Marker symbols per step status, shared by every plan rendering path
+STATUS_MARKS = {
+    "completed": "[✓]",
+    "in_progress": "[→]",
+    "blocked": "[!]",
+    "not_started": "[ ]",
+}
+
+
+def render_steps(
+    steps: List[str],
+    step_statuses: List[str],
+    step_notes: List[str],
+    status_marks: Dict[str, str] = STATUS_MARKS,
+) -> str:
+    """Render the numbered step lines of a plan in a single pass.
+
+    Builds a preallocated parts list joined once at the end, so rendering
+    stays linear in the plan size instead of quadratic string concatenation.
+    """
+    default_mark = status_marks.get("not_started", "[ ]")
+    parts = []
+    for i, (step, status, notes) in enumerate(zip(steps, step_statuses, step_notes)):
+        parts.append(f"{i}. {status_marks.get(status, default_mark)} {step}\n")
+        if notes:
+            parts.append(f"   Notes: {notes}\n")
+    return "".join(parts)
+
 
 class PlanningTool(BaseTool):
     """
@@ -23,7 +51,7 @@ class PlanningTool(BaseTool):
         "type": "object",
         "properties": {
             "command": {
-                "description": "The command to execute. Available commands: create, update, list, get, set_active, mark_step, delete.",
+                "description": "The command to execute. Available commands: create, update, list, get, set_active, mark_step, mark_steps, delete.",
                 "enum": [
                     "create",
                     "update",
@@ -31,6 +59,7 @@ class PlanningTool(BaseTool):
                     "get",
                     "set_active",
                     "mark_step",
+                    "mark_steps",
                     "delete",
                 ],
                 "type": "string",
@@ -61,6 +90,27 @@ class PlanningTool(BaseTool):
                 "description": "Additional notes for a step. Optional for mark_step command.",
                 "type": "string",
             },
+            "step_updates": {
+                "description": "List of step updates to apply in one call. Required for mark_steps command. Each item needs a step_index and may include step_status and step_notes.",
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "step_index": {"type": "integer"},
+                        "step_status": {
+                            "enum": [
+                                "not_started",
+                                "in_progress",
+                                "completed",
+                                "blocked",
+                            ],
+                            "type": "string",
+                        },
+                        "step_notes": {"type": "string"},
+                    },
+                    "required": ["step_index"],
+                },
+            },
         },
         "required": ["command"],
         "additionalProperties": False,
@@ -73,7 +123,14 @@ class PlanningTool(BaseTool):
         self,
         *,
         command: Literal[
-            "create", "update", "list", "get", "set_active", "mark_step", "delete"
+            "create",
+            "update",
+            "list",
+            "get",
+            "set_active",
+            "mark_step",
+            "mark_steps",
+            "delete",
         ],
         plan_id: Optional[str] = None,
         title: Optional[str] = None,
@@ -83,6 +140,7 @@ class PlanningTool(BaseTool):
             Literal["not_started", "in_progress", "completed", "blocked"]
         ] = None,
         step_notes: Optional[str] = None,
+        step_updates: Optional[List[Dict]] = None,
         **kwargs,
     ):
         """
@@ -96,6 +154,7 @@ class PlanningTool(BaseTool):
         - step_index: Index of the step to update (used with mark_step command)
         - step_status: Status to set for a step (used with mark_step command)
         - step_notes: Additional notes for a step (used with mark_step command)
+        - step_updates: List of step updates to apply (used with mark_steps command)
         """
 
         if command == "create":
@@ -110,11 +169,13 @@ class PlanningTool(BaseTool):
             return self._set_active_plan(plan_id)
         elif command == "mark_step":
             return self._mark_step(plan_id, step_index, step_status, step_notes)
+        elif command == "mark_steps":
+            return self._mark_steps(plan_id, step_updates)
         elif command == "delete":
             return self._delete_plan(plan_id)
         else:
             raise ToolError(
-                f"Unrecognized command: {command}. Allowed commands are: create, update, list, get, set_active, mark_step, delete"
+                f"Unrecognized command: {command}. Allowed commands are: create, update, list, get, set_active, mark_step, mark_steps, delete"
             )
 
     def _create_plan(
@@ -303,6 +364,63 @@ class PlanningTool(BaseTool):
             output=f"Step {step_index} updated in plan '{plan_id}'.\n\n{self._format_plan(plan)}"
         )
 
+    def _mark_steps(
+        self, plan_id: Optional[str], step_updates: Optional[List[Dict]]
+    ) -> ToolResult:
+        """Mark multiple steps with statuses and optional notes in one call."""
+        if not plan_id:
+            # If no plan_id is provided, use the current active plan
+            if not self._current_plan_id:
+                raise ToolError(
+                    "No active plan. Please specify a plan_id or set an active plan."
+                )
+            plan_id = self._current_plan_id
+
+        if plan_id not in self.plans:
+            raise ToolError(f"No plan found with ID: {plan_id}")
+
+        if not step_updates or not isinstance(step_updates, list):
+            raise ToolError(
+                "Parameter `step_updates` must be a non-empty list for command: mark_steps"
+            )
+
+        plan = self.plans[plan_id]
+
+        # Validate every update before applying any, so the batch is atomic
+        for update in step_updates:
+            if not isinstance(update, dict) or "step_index" not in update:
+                raise ToolError(
+                    "Each step update must be a dict with a `step_index` field"
+                )
+
+            step_index = update["step_index"]
+            if step_index < 0 or step_index >= len(plan["steps"]):
+                raise ToolError(
+                    f"Invalid step_index: {step_index}. Valid indices range from 0 to {len(plan['steps'])-1}."
+                )
+
+            step_status = update.get("step_status")
+            if step_status and step_status not in [
+                "not_started",
+                "in_progress",
+                "completed",
+                "blocked",
+            ]:
+                raise ToolError(
+                    f"Invalid step_status: {step_status}. Valid statuses are: not_started, in_progress, completed, blocked"
+                )
+
+        for update in step_updates:
+            step_index = update["step_index"]
+            if update.get("step_status"):
+                plan["step_statuses"][step_index] = update["step_status"]
+            if update.get("step_notes"):
+                plan["step_notes"][step_index] = update["step_notes"]
+
+        return ToolResult(
+            output=f"{len(step_updates)} steps updated in plan '{plan_id}'.\n\n{self._format_plan(plan)}"
+        )
+
     def _delete_plan(self, plan_id: Optional[str]) -> ToolResult:
         """Delete a plan."""
         if not plan_id:
@@ -321,8 +439,7 @@ class PlanningTool(BaseTool):
 
     def _format_plan(self, plan: Dict) -> str:
         """Format a plan for display."""
-        output = f"Plan: {plan['title']} (ID: {plan['plan_id']})\n"
-        output += "=" * len(output) + "\n\n"
+        header = f"Plan: {plan['title']} (ID: {plan['plan_id']})\n"
 
         # Calculate progress statistics
         total_steps = len(plan["steps"])
@@ -335,29 +452,22 @@ class PlanningTool(BaseTool):
             1 for status in plan["step_statuses"] if status == "not_started"
         )
 
-        output += f"Progress: {completed}/{total_steps} steps completed "
+        progress = f"Progress: {completed}/{total_steps} steps completed "
         if total_steps > 0:
             percentage = (completed / total_steps) * 100
-            output += f"({percentage:.1f}%)\n"
+            progress += f"({percentage:.1f}%)\n"
         else:
-            output += "(0%)\n"
-
-        output += f"Status: {completed} completed, {in_progress} in progress, {blocked} blocked, {not_started} not started\n\n"
-        output += "Steps:\n"
-
-        # Add each step with its status and notes
-        for i, (step, status, notes) in enumerate(
-            zip(plan["steps"], plan["step_statuses"], plan["step_notes"])
-        ):
-            status_symbol = {
-                "not_started": "[ ]",
-                "in_progress": "[→]",
-                "completed": "[✓]",
-                "blocked": "[!]",
-            }.get(status, "[ ]")
-
-            output += f"{i}. {status_symbol} {step}\n"
-            if notes:
-                output += f"   Notes: {notes}\n"
-
-        return output
+            progress += "(0%)\n"
+
+        # Build with a parts list and a single join rather than repeated +=
+        parts = [
+            header,
+            "=" * len(header),
+            "\n\n",
+            progress,
+            f"Status: {completed} completed, {in_progress} in progress, {blocked} blocked, {not_started} not started\n\n",
+            "Steps:\n",
+            render_steps(plan["steps"], plan["step_statuses"], plan["step_notes"]),
+        ]
+
+        return "".join(parts)